@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from wsgiref.util import setup_testing_defaults
+
+# every profile sets both flags, so the parent environment and .env.dev can't change what a row measures
+PROFILES = {
+    'default': {'API_ONLY': 'False', 'ADMIN_ENABLED': 'True'},
+    'api-only': {'API_ONLY': 'True', 'ADMIN_ENABLED': 'True'},
+    'no-admin': {'API_ONLY': 'True', 'ADMIN_ENABLED': 'False'},
+}
+
+
+def main():
+    parser = create_parser()
+    namespace = parser.parse_args()
+    if namespace.child:
+        measure_worker(namespace.path)
+        return
+
+    print(f'{"profile":<10} {"import, ms":>12} {"first request, ms":>18} {"status":>7}')
+    for profile, profile_env in PROFILES.items():
+        results = [run_worker(profile_env, namespace.path) for _ in range(namespace.repeat)]
+        import_ms = statistics.median(x['import'] for x in results) * 1000
+        request_ms = statistics.median(x['request'] for x in results) * 1000
+        print(f'{profile:<10} {import_ms:>12.1f} {request_ms:>18.1f} {results[-1]["status"]:>7}')
+
+
+def run_worker(profile_env, path):
+    """Boots the application in a fresh interpreter, the same way a gunicorn worker does"""
+    worker_env = {**os.environ, **profile_env}
+    output = subprocess.run([sys.executable, __file__, '--child', '--path', path],
+                            env=worker_env, capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(output.stdout.splitlines()[-1])
+
+
+def measure_worker(path):
+    start = time.perf_counter()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pets.settings')
+    from pets.wsgi import application
+    from django.conf import settings
+    imported = time.perf_counter()
+
+    host = settings.ALLOWED_HOSTS[0].lstrip('.') if settings.ALLOWED_HOSTS[0] != '*' else 'localhost'
+    environ = {'PATH_INFO': path, 'HTTP_HOST': host,
+               'HTTP_' + settings.API_KEY_HEADER.upper().replace('-', '_'): settings.API_KEY}
+    setup_testing_defaults(environ)
+    response_status = []
+    body = application(environ, lambda status, headers: response_status.append(status))
+    b''.join(body)
+    finished = time.perf_counter()
+
+    print(json.dumps({'import': imported - start,
+                      'request': finished - imported,
+                      'status': response_status[0].split()[0]}))
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        description='Measures worker boot (settings and application import) and first request time '
+                    'for each settings profile. The configured database should be migrated.')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of worker boots per profile.')
+    parser.add_argument('--path', default='/pets', help='Path of the first request.')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    return parser
+
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,9 @@ import environ
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 env = environ.Env()
-environ.Env.read_env(os.path.join(BASE_DIR, '.env.dev'))
+ENV_FILE = os.path.join(BASE_DIR, '.env.dev')
+if os.path.exists(ENV_FILE):
+    environ.Env.read_env(ENV_FILE)
 
 SECRET_KEY = env("SECRET_KEY")
 
@@ -23,16 +25,25 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'mediafiles')
 CSRF_TRUSTED_ORIGINS = [env('SERVER_ADDRESS')]
 ALLOWED_HOSTS = env("DJANGO_ALLOWED_HOSTS").split(" ")
 
+# API_ONLY runs the session, CSRF, auth and messages middleware for admin routes only,
+# ADMIN_ENABLED=False drops the admin site and the apps it depends on altogether
+API_ONLY = env.bool('API_ONLY', default=False)
+ADMIN_ENABLED = env.bool('ADMIN_ENABLED', default=True)
+ADMIN_URL = 'admin/'
+
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
-    'django.contrib.sessions',
-    'django.contrib.messages',
     'django.contrib.staticfiles',
     'pets_module.apps.PetsModuleConfig',
     'rest_framework',
 ]
+if ADMIN_ENABLED:
+    INSTALLED_APPS += [
+        'django.contrib.admin',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+    ]
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -40,16 +51,31 @@ REST_FRAMEWORK = {
     ]
 }
 
-MIDDLEWARE = [
+BASE_MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ADMIN_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# the admin middleware, or AdminOnlyMiddleware wrapping it, goes between CommonMiddleware and XFrameOptionsMiddleware
+API_ONLY_MIDDLEWARE = BASE_MIDDLEWARE[:2] + ['pets_module.middleware.AdminOnlyMiddleware'] + BASE_MIDDLEWARE[2:]
+
+if not ADMIN_ENABLED:
+    MIDDLEWARE = list(BASE_MIDDLEWARE)
+elif API_ONLY:
+    MIDDLEWARE = list(API_ONLY_MIDDLEWARE)
+    # the admin middleware is still run by AdminOnlyMiddleware, checks can't see it there
+    SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+else:
+    MIDDLEWARE = BASE_MIDDLEWARE[:2] + ADMIN_MIDDLEWARE + BASE_MIDDLEWARE[2:]
+
 ROOT_URLCONF = 'pets.urls'
 
 TEMPLATES = [
@@ -62,8 +88,7 @@ TEMPLATES = [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
+            ] + (['django.contrib.messages.context_processors.messages'] if ADMIN_ENABLED else []),
         },
     },
 ]
@@ -81,6 +106,17 @@ DATABASES = {
     }
 }
 
+# Safe reads go to the replicas, writes and reads of a client that has just written go to the primary
+REPLICA_DATABASES = []
+for number, url in enumerate(env('SQL_REPLICA_URLS', default='').split(), start=1):
+    DATABASES[f'replica{number}'] = {**environ.Env.db_url_config(url), 'TEST': {'MIRROR': 'default'}}
+    REPLICA_DATABASES.append(f'replica{number}')
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=5)
+
+DATABASE_ROUTERS = ['pets_module.routers.PrimaryReplicaRouter']
+if REPLICA_DATABASES:
+    MIDDLEWARE += ['pets_module.middleware.PrimaryPinningMiddleware']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -0,0 +1,14 @@
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+# test transactions are not visible to replica connections, so configured replicas are read through the primary,
+# tests of the routing set REPLICA_DATABASES themselves
+REPLICA_DATABASES = []
+
+# a separate SQLite database, not a mirror of the primary, stands in for a replica in TestReplicaDatabase
+DATABASES['test_replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': os.path.join(BASE_DIR, 'test_replica.sqlite3'),
+}
@@ -1,5 +1,4 @@
 from django.conf.urls.static import static
-from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import SimpleRouter
 
@@ -10,8 +9,11 @@ router = SimpleRouter(trailing_slash=False)
 router.register(r'pets', PetViewSet, basename='pets')
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('', include(router.urls)),
 ]
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path(settings.ADMIN_URL, admin.site.urls))
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
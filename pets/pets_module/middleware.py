@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+
+from .routers import choose_replica, pinned_to_primary, request_replica
+
+
+class AdminOnlyMiddleware:
+    """Runs ADMIN_MIDDLEWARE for the admin site only, API requests skip it entirely"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.admin_middleware = []
+        handler = get_response
+        for middleware_path in reversed(settings.ADMIN_MIDDLEWARE):
+            handler = import_string(middleware_path)(handler)
+            self.admin_middleware.insert(0, handler)
+        self.admin_handler = handler
+
+    def is_admin_request(self, request):
+        return request.path_info.startswith('/' + settings.ADMIN_URL)
+
+    def __call__(self, request):
+        if self.is_admin_request(request):
+            return self.admin_handler(request)
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # process_view hooks are collected by the handler, so the wrapped ones are run by hand
+        if not self.is_admin_request(request):
+            return None
+        for middleware in self.admin_middleware:
+            if hasattr(middleware, 'process_view'):
+                response = middleware.process_view(request, view_func, view_args, view_kwargs)
+                if response:
+                    return response
+        return None
+
+
+class PrimaryPinningMiddleware:
+    """Pins writes and the reads following them from the same client to the primary database,
+    other requests read from one replica chosen per request so all their queries see the same data"""
+
+    cookie_name = 'pin_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        is_write = request.method not in SAFE_METHODS
+        pinned_token = pinned_to_primary.set(is_write or self.cookie_name in request.COOKIES)
+        replica_token = request_replica.set(choose_replica())
+        try:
+            response = self.get_response(request)
+        finally:
+            request_replica.reset(replica_token)
+            pinned_to_primary.reset(pinned_token)
+        if is_write:
+            response.set_cookie(self.cookie_name, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True)
+        return response
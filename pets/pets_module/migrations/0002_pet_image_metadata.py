@@ -0,0 +1,73 @@
+# Generated by Django 4.1.5 on 2026-10-19 13:06
+
+import hashlib
+import mimetypes
+
+from PIL import Image, UnidentifiedImageError
+from django.db import migrations, models
+
+
+def image_metadata(file):
+    content_hash = hashlib.sha256()
+    for chunk in file.chunks():
+        content_hash.update(chunk)
+    metadata = {'content_hash': content_hash.hexdigest(),
+                'size': file.size,
+                'mime_type': 'application/octet-stream'}
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            metadata.update(width=image.width, height=image.height,
+                            mime_type=Image.MIME.get(image.format, 'application/octet-stream'))
+    except Image.DecompressionBombError:
+        metadata['mime_type'] = mimetypes.guess_type(file.name)[0] or 'application/octet-stream'
+    except (UnidentifiedImageError, OSError):
+        pass
+    return metadata
+
+
+def fill_image_metadata(apps, schema_editor):
+    PetImage = apps.get_model('pets_module', 'PetImage')
+    for pet_image in PetImage.objects.using(schema_editor.connection.alias).exclude(image='').filter(content_hash=''):
+        try:
+            with pet_image.image.open('rb') as file:
+                metadata = image_metadata(file)
+        except OSError:
+            continue
+        PetImage.objects.using(schema_editor.connection.alias).filter(pk=pet_image.pk).update(**metadata)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets_module', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='petimage',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='SHA-256 of the content'),
+        ),
+        migrations.AddField(
+            model_name='petimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='petimage',
+            name='mime_type',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='petimage',
+            name='size',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Size in bytes'),
+        ),
+        migrations.AddField(
+            model_name='petimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_image_metadata, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,10 @@
+import hashlib
+import mimetypes
 import uuid
 
-from django.db import models
-from django.db.models.signals import pre_delete
+from PIL import Image, UnidentifiedImageError
+from django.db import connections, models, router, transaction
+from django.db.models.signals import post_delete
 from django.dispatch import receiver
 
 
@@ -30,16 +33,77 @@ class Pet(models.Model):
 
 
 class PetImage(models.Model):
-    """Model for specific pet images"""
+    """Model for specific pet images, records with identical content share one stored file"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, auto_created=True)
     pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='photos')
     image = models.ImageField(upload_to='images/', max_length=100, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, verbose_name='SHA-256 of the content')
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    size = models.PositiveIntegerField(null=True, blank=True, verbose_name='Size in bytes')
+    mime_type = models.CharField(max_length=100, blank=True)
 
     def __str__(self):
         return self.image
 
+    def save(self, *args, **kwargs):
+        if not self.image or self.image._committed:
+            return super().save(*args, **kwargs)
+        for field, value in image_metadata(self.image.file).items():
+            setattr(self, field, value)
+        using = kwargs.get('using') or router.db_for_write(PetImage, instance=self)
+        with transaction.atomic(using=using):
+            # the hash lock makes uploads of the same content store it once, the row lock keeps
+            # a concurrent delete of the reused record waiting until this record is committed
+            lock_content_hash(using, self.content_hash)
+            duplicate = (PetImage.objects.using(using).select_for_update()
+                         .filter(content_hash=self.content_hash).exclude(pk=self.pk).first())
+            if duplicate:
+                self.image = duplicate.image.name
+            super().save(*args, **kwargs)
 
-@receiver(pre_delete, sender=PetImage)
-def image_model_delete(sender, instance, **kwargs):
+
+def lock_content_hash(using, content_hash):
+    """Takes a lock on the content hash until the end of the transaction, PostgreSQL only"""
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [int(content_hash[:15], 16)])
+
+
+def image_metadata(file):
+    """Returns the content hash, dimensions, size and MIME type of an image file"""
+    content_hash = hashlib.sha256()
+    for chunk in file.chunks():
+        content_hash.update(chunk)
+    metadata = {'content_hash': content_hash.hexdigest(),
+                'size': file.size,
+                'width': None,
+                'height': None,
+                'mime_type': 'application/octet-stream'}
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            metadata.update(width=image.width, height=image.height,
+                            mime_type=Image.MIME.get(image.format, 'application/octet-stream'))
+    except Image.DecompressionBombError:
+        # the content is a recognised image too large to decode, so only its type is taken from the name
+        metadata['mime_type'] = mimetypes.guess_type(file.name)[0] or 'application/octet-stream'
+    except (UnidentifiedImageError, OSError):
+        # the file is stored anyway, nothing about its content is known
+        pass
+    file.seek(0)
+    return metadata
+
+
+@receiver(post_delete, sender=PetImage)
+def image_model_delete(sender, instance, using, **kwargs):
+    # the file is shared by all records with the same content, so it is removed once the delete is
+    # committed and only if no record references it by then
     if instance.image.name:
-        instance.image.delete(save=False)
+        transaction.on_commit(lambda: delete_unreferenced_image(instance.image, using), using=using)
+
+
+def delete_unreferenced_image(image, using):
+    if not PetImage.objects.using(using).filter(image=image.name).exists():
+        image.delete(save=False)
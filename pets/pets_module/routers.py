@@ -0,0 +1,34 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+request_replica = ContextVar('request_replica', default=None)
+
+
+class PrimaryReplicaRouter:
+    """Routes writes to the primary and reads to the replica chosen for the request, unless it is pinned to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if pinned_to_primary.get() or not settings.REPLICA_DATABASES:
+            return 'default'
+        # outside a request there is no chosen replica, so every read picks its own
+        return request_replica.get() or choose_replica()
+
+    def db_for_write(self, model, **hints):
+        # objects of databases outside the primary and its replicas stay where they are
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db not in (None, 'default', *settings.REPLICA_DATABASES):
+            return instance._state.db
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = ['default', *settings.REPLICA_DATABASES]
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+def choose_replica():
+    return random.choice(settings.REPLICA_DATABASES) if settings.REPLICA_DATABASES else None
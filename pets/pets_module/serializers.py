@@ -5,7 +5,7 @@ from .models import Pet, PetImage
 class PetImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = PetImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'content_hash', 'width', 'height', 'size', 'mime_type']
 
 
 class PetSerializer(serializers.ModelSerializer):
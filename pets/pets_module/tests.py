@@ -1,5 +1,11 @@
+from unittest import mock, skipUnless
+
 from django.urls import reverse
 from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
 
@@ -7,11 +13,17 @@ from pets.settings import API_KEY, API_KEY_HEADER
 from pets_module.models import Pet, PetImage, PetType
 
 from PIL import Image
+import hashlib
+import io
+import os
+import shutil
 import tempfile
 
+from pets_module.routers import PrimaryReplicaRouter, pinned_to_primary, request_replica
 from pets_module.serializers import PetSerializer
 
 settings.MEDIA_ROOT = '/test'
+PINNING_MIDDLEWARE = 'pets_module.middleware.PrimaryPinningMiddleware'
 
 
 class TestCreatePet(APITestCase):
@@ -259,6 +271,218 @@ class TestGetPets(APITestCase):
                 self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+@override_settings(MIDDLEWARE=settings.API_ONLY_MIDDLEWARE)
+class TestApiOnlyProfile(APITestCase):
+    """ Test module for the API_ONLY middleware profile """
+
+    fixtures = ['pet_types.json']
+
+    def setUp(self) -> None:
+        self.headers = {'HTTP_' + API_KEY_HEADER: API_KEY}
+
+    def test_api_skips_admin_middleware(self):
+        self.client.credentials(**self.headers)
+        response = self.client.post(reverse('pets-list'), {'name': 'SomePet', 'age': 6, 'type': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(reverse('pets-list'), type='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+        self.assertNotIn(settings.CSRF_COOKIE_NAME, response.cookies)
+
+    @skipUnless(settings.ADMIN_ENABLED, 'admin site is disabled')
+    def test_admin_keeps_admin_middleware(self):
+        response = self.client.get(reverse('admin:login'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(hasattr(response.wsgi_request, 'session'))
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+
+    @skipUnless(settings.ADMIN_ENABLED, 'admin site is disabled')
+    def test_admin_enforces_csrf(self):
+        self.client.handler.enforce_csrf_checks = True
+        response = self.client.post(reverse('admin:login'), {'username': 'user', 'password': 'password'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'])
+class TestReplicaRouting(APITestCase):
+    """ Test module for routing reads to the replica databases """
+
+    fixtures = ['pet_types.json']
+
+    def setUp(self) -> None:
+        self.headers = {'HTTP_' + API_KEY_HEADER: API_KEY}
+        self.router = PrimaryReplicaRouter()
+
+    def test_read_from_replica(self):
+        self.assertIn(self.router.db_for_read(Pet), ['replica1', 'replica2'])
+        self.assertEqual(self.router.db_for_write(Pet), 'default')
+
+    def test_read_from_primary_when_pinned(self):
+        token = pinned_to_primary.set(True)
+        try:
+            self.assertEqual(self.router.db_for_read(Pet), 'default')
+        finally:
+            pinned_to_primary.reset(token)
+
+    def test_read_from_request_replica(self):
+        token = request_replica.set('replica2')
+        try:
+            self.assertEqual({self.router.db_for_read(Pet) for _ in range(10)}, {'replica2'})
+        finally:
+            request_replica.reset(token)
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_read_from_primary_without_replicas(self):
+        self.assertEqual(self.router.db_for_read(Pet), 'default')
+
+
+@override_settings(REPLICA_DATABASES=['test_replica'],
+                   MIDDLEWARE=[x for x in settings.MIDDLEWARE if x != PINNING_MIDDLEWARE] + [PINNING_MIDDLEWARE])
+class TestReplicaDatabase(TransactionTestCase):
+    """ Test module for reading from a real replica database """
+
+    databases = {'default', 'test_replica'}
+    fixtures = ['pet_types.json']
+
+    def setUp(self) -> None:
+        self.headers = {'HTTP_' + API_KEY_HEADER: API_KEY}
+        self.client.defaults.update(self.headers)
+        Pet.objects.using('test_replica').create(name='ReplicaPet', age=6,
+                                                 type=PetType.objects.using('test_replica').get(pk=2))
+
+    def get_pets(self):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['test_replica']) as replica:
+            response = self.client.get(reverse('pets-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(primary), len(replica)
+
+    def test_read_from_replica(self):
+        response, primary_queries, replica_queries = self.get_pets()
+        self.assertNotIn('pin_primary', response.cookies)
+        self.assertEqual([x['name'] for x in response.data['data']], ['ReplicaPet'])
+        self.assertEqual(primary_queries, 0)
+        self.assertGreater(replica_queries, 0)
+
+    def test_read_after_write_from_primary(self):
+        response = self.client.post(reverse('pets-list'), {'name': 'SomePet', 'age': 6, 'type': 2},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.cookies['pin_primary']['max-age'], settings.REPLICA_PIN_SECONDS)
+        response, primary_queries, replica_queries = self.get_pets()
+        self.assertEqual([x['name'] for x in response.data['data']], ['SomePet'])
+        self.assertGreater(primary_queries, 0)
+        self.assertEqual(replica_queries, 0)
+        self.assertFalse(pinned_to_primary.get())
+
+
+class TestPhotoStorage(APITestCase):
+    """ Test module for photo metadata and deduplication """
+
+    fixtures = ['pet_types.json']
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        cls.addClassCleanup(media_settings.disable)
+        super().setUpClass()
+
+    def setUp(self) -> None:
+        self.headers = {'HTTP_' + API_KEY_HEADER: API_KEY}
+        self.client.credentials(**self.headers)
+        self.first_pet = Pet.objects.create(name='FirstPet', age=16, type=PetType.objects.get(pk=1))
+        self.second_pet = Pet.objects.create(name='SecondPet', age=6, type=PetType.objects.get(pk=2))
+
+    def upload(self, pet, file):
+        return self.client.post(reverse('pets-photo', kwargs={'pk': pet.pk}), {'file': file}, format='multipart')
+
+    def test_photo_metadata(self):
+        content = image_content((120, 80))
+        self.upload(self.first_pet, SimpleUploadedFile('photo.png', content))
+        photo = PetImage.objects.get()
+        self.assertEqual(photo.content_hash, hashlib.sha256(content).hexdigest())
+        self.assertEqual((photo.width, photo.height), (120, 80))
+        self.assertEqual(photo.size, len(content))
+        self.assertEqual(photo.mime_type, 'image/png')
+        response = self.client.get(reverse('pets-list'), type='json')
+        data = response.data['data'][0]['photos'][0]
+        self.assertEqual(data['content_hash'], photo.content_hash)
+        self.assertEqual((data['width'], data['height'], data['size']), (120, 80, len(content)))
+        self.assertEqual(data['mime_type'], 'image/png')
+
+    def test_photo_too_large_to_decode(self):
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            response = self.upload(self.first_pet, SimpleUploadedFile('photo.png', image_content((100, 100))))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        photo = PetImage.objects.get()
+        self.assertEqual((photo.width, photo.height), (None, None))
+        self.assertEqual(photo.mime_type, 'image/png')
+
+    def test_not_an_image(self):
+        content = b'not an image'
+        response = self.upload(self.first_pet, SimpleUploadedFile('photo.png', content))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        photo = PetImage.objects.get()
+        self.assertEqual(photo.content_hash, hashlib.sha256(content).hexdigest())
+        self.assertEqual((photo.width, photo.height, photo.size), (None, None, len(content)))
+        self.assertEqual(photo.mime_type, 'application/octet-stream')
+
+    def test_identical_photos_stored_once(self):
+        content = image_content((100, 100))
+        images_dir = os.path.join(settings.MEDIA_ROOT, 'images')
+        stored_files = set(os.listdir(images_dir)) if os.path.exists(images_dir) else set()
+        self.upload(self.first_pet, SimpleUploadedFile('first.png', content))
+        self.upload(self.second_pet, SimpleUploadedFile('second.png', content))
+        self.upload(self.second_pet, SimpleUploadedFile('third.png', image_content((50, 50))))
+        self.assertEqual(PetImage.objects.count(), 3)
+        self.assertEqual(len(set(os.listdir(images_dir)) - stored_files), 2)
+        first_photo = self.first_pet.photos.get()
+        self.assertEqual(self.second_pet.photos.filter(image=first_photo.image.name).count(), 1)
+
+    def test_shared_file_deleted_with_last_photo(self):
+        content = image_content((100, 100))
+        self.upload(self.first_pet, SimpleUploadedFile('first.png', content))
+        self.upload(self.second_pet, SimpleUploadedFile('second.png', content))
+        path = PetImage.objects.first().image.path
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('pets-list'), {'ids': [self.first_pet.pk]}, format='json')
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('pets-list'), {'ids': [self.second_pet.pk]}, format='json')
+        self.assertFalse(os.path.exists(path))
+
+    def test_shared_file_deleted_with_all_photos(self):
+        content = image_content((100, 100))
+        self.upload(self.first_pet, SimpleUploadedFile('first.png', content))
+        self.upload(self.second_pet, SimpleUploadedFile('second.png', content))
+        path = PetImage.objects.first().image.path
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('pets-list'), {'ids': [self.first_pet.pk, self.second_pet.pk]}, format='json')
+        self.assertEqual(PetImage.objects.count(), 0)
+        self.assertFalse(os.path.exists(path))
+
+    def test_file_kept_when_delete_rolled_back(self):
+        self.upload(self.first_pet, SimpleUploadedFile('first.png', image_content((100, 100))))
+        path = PetImage.objects.get().image.path
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.first_pet.delete()
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(PetImage.objects.count(), 1)
+        self.assertTrue(os.path.exists(path))
+
+
+def image_content(size):
+    content = io.BytesIO()
+    Image.new('RGB', size).save(content, format='PNG')
+    return content.getvalue()
+
+
 def temporary_file():
     image = Image.new('RGB', (100, 100))
     tmp_file = tempfile.NamedTemporaryFile(prefix='test', suffix='.jpg')